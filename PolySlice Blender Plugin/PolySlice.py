@@ -9,13 +9,26 @@ bl_info = {
 }
 
 import bpy
-from bpy.props import FloatProperty, PointerProperty, StringProperty
+import bpy.utils.previews
+from bpy.props import BoolProperty, FloatProperty, IntProperty, PointerProperty, StringProperty
 from bpy.types import Operator, Panel, PropertyGroup
 import re
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import threading
 from itertools import groupby
 from operator import itemgetter
 from mathutils import Vector
 import bmesh
+import numpy as np
+
+# Update the layer preview when its slider or position changes
+def update_preview(self, context):
+    show_preview(self)
 
 # Property Group to hold custom properties
 class PolySliceProperties(PropertyGroup):
@@ -33,6 +46,16 @@ class PolySliceProperties(PropertyGroup):
         min=0.1,
         max=4.0,
     )
+    incremental_slice: BoolProperty(
+        name="Incremental Slice",
+        description="Only re-slice and re-render the layers whose part of the model changed since the last low memory slice",
+        default=False,
+    )
+    color_shell_only: BoolProperty(
+        name="Color Shell Only",
+        description="Only ink the outer shell of the model, Color Thickness deep, instead of the whole cross-section of each layer",
+        default=False,
+    )
     output_directory: StringProperty(
         name="Output Directory",
         description="Directory to save outputs",
@@ -58,6 +81,922 @@ class PolySliceProperties(PropertyGroup):
         min=0.1,
         max=4.0,
     )
+    low_memory_slice: BoolProperty(
+        name="Low Memory Slice",
+        description="Slice from the evaluated mesh into new layer objects without duplicating the model or storing an undo step",
+        default=False,
+    )
+    export_in_background: BoolProperty(
+        name="Save STL In Background",
+        description="Write the STL file on a background thread so Blender stays responsive while it is saved",
+        default=False,
+    )
+    stl_status: StringProperty(
+        name="STL Status",
+        description="Result of the last STL save",
+        default="",
+    )
+    ink_per_mm2: FloatProperty(
+        name="Ink Per mm²",
+        description="Ink(nL) one color channel puts on one mm² at full strength - must match printer",
+        default=5.0,
+        min=0.01,
+        max=100.0,
+    )
+    swath_width: FloatProperty(
+        name="Swath Width",
+        description="Width(mm) the print head covers in one pass - must match printer",
+        default=4.0,
+        min=0.1,
+        max=50.0,
+    )
+    pass_time: FloatProperty(
+        name="Pass Time",
+        description="Seconds the print head needs for one pass over the bed",
+        default=1.5,
+        min=0.0,
+        max=60.0,
+    )
+    estimated_layers: IntProperty(
+        name="Estimated Layers",
+        description="Number of layers in the last ink estimate",
+        default=0,
+    )
+    estimated_cyan: FloatProperty(
+        name="Estimated Cyan",
+        description="Cyan ink(mL) needed by the last estimated layer stack",
+        default=0.0,
+    )
+    estimated_magenta: FloatProperty(
+        name="Estimated Magenta",
+        description="Magenta ink(mL) needed by the last estimated layer stack",
+        default=0.0,
+    )
+    estimated_yellow: FloatProperty(
+        name="Estimated Yellow",
+        description="Yellow ink(mL) needed by the last estimated layer stack",
+        default=0.0,
+    )
+    estimated_passes: IntProperty(
+        name="Estimated Passes",
+        description="Print head passes needed by the last estimated layer stack",
+        default=0,
+    )
+    estimated_seconds: FloatProperty(
+        name="Estimated Seconds",
+        description="Seconds the print head adds to the print for the last estimated layer stack",
+        default=0.0,
+    )
+    preview_size: IntProperty(
+        name="Preview Size",
+        description="Width(px) of each layer in the preview atlas",
+        default=128,
+        min=32,
+        max=512,
+    )
+    preview_layer: IntProperty(
+        name="Layer",
+        description="Layer shown in the preview",
+        default=1,
+        min=1,
+        max=9999,
+        update=update_preview,
+    )
+    preview_position: FloatProperty(
+        name="Cross-Section",
+        description="Position across the bed of the side cross-section through all layers",
+        default=0.5,
+        min=0.0,
+        max=1.0,
+        subtype='FACTOR',
+        update=update_preview,
+    )
+    reference_directory: StringProperty(
+        name="Reference Directory",
+        description="Directory holding a known good layer stack to compare the output against",
+        default="",
+        subtype='DIR_PATH',
+    )
+    pixel_tolerance: FloatProperty(
+        name="Pixel Tolerance",
+        description="Largest colour/alpha difference (0-1) a pixel may have before it counts as changed",
+        default=0.1,
+        min=0.0,
+        max=1.0,
+    )
+    layer_tolerance: FloatProperty(
+        name="Layer Tolerance",
+        description="Fraction of pixels a layer may have that match none of the pixels around the same place in the other image before it fails the comparison",
+        default=0.0001,
+        min=0.0,
+        max=1.0,
+        precision=4,
+    )
+    edge_tolerance: FloatProperty(
+        name="Edge Tolerance",
+        description="Fraction of pixels a layer may have that differ from the pixel at the same place in the reference, e.g. on anti-aliased edges or shifted by one pixel, before it fails the comparison",
+        default=0.001,
+        min=0.0,
+        max=1.0,
+        precision=4,
+    )
+    last_slice_time: FloatProperty(
+        name="Last Slice Time",
+        description="Seconds taken by the last Slice run",
+        default=0.0,
+    )
+
+# Layer images are written as <frame>.png by the animation render
+LAYER_FILE_PATTERN = re.compile(r'(\d+)\.png$', re.IGNORECASE)
+
+# Return {frame number: path} for every layer image in a directory
+def layer_files(directory):
+    files = {}
+    if not os.path.isdir(directory):
+        return files
+    for name in os.listdir(directory):
+        match = LAYER_FILE_PATTERN.match(name)
+        if match:
+            files[int(match.group(1))] = os.path.join(directory, name)
+    return dict(sorted(files.items()))
+
+# Load an image file into an (height, width, 4) float32 RGBA array
+def read_image_pixels(path):
+    image = bpy.data.images.load(path, check_existing=False)
+    try:
+        width, height = image.size
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+    finally:
+        bpy.data.images.remove(image)
+    return pixels.reshape(height, width, 4)
+
+# Nearest neighbour resample of an (height, width, 4) array to a new size
+def resample_pixels(pixels, height, width):
+    rows = ((np.arange(height) + 0.5) * pixels.shape[0] / height).astype(np.intp)
+    cols = ((np.arange(width) + 0.5) * pixels.shape[1] / width).astype(np.intp)
+    return pixels[rows[:, None], cols[None, :]]
+
+# Save an (height, width, 4) float RGBA array as a PNG file
+def write_image_pixels(path, pixels):
+    height, width = pixels.shape[:2]
+    image = bpy.data.images.new(os.path.basename(path), width, height, alpha=True)
+    try:
+        image.pixels.foreach_set(pixels.ravel())
+        image.filepath_raw = path
+        image.file_format = 'PNG'
+        image.save()
+    finally:
+        bpy.data.images.remove(image)
+
+# Size of one layer image pixel in mm, None unless the layers are rendered by an orthographic camera.
+# Taken from the render settings unless the (height, width) of an image already on disk is given.
+def layer_pixel_size(scene, image_shape=None):
+    camera = scene.camera
+    if camera is None or camera.type != 'CAMERA' or camera.data.type != 'ORTHO':
+        return None
+    if image_shape is not None:
+        return camera.data.ortho_scale / max(image_shape[0], image_shape[1])
+    render = scene.render
+    scale = render.resolution_percentage / 100
+    return camera.data.ortho_scale / max(render.resolution_x * scale, render.resolution_y * scale)
+
+# Pixels more than `radius` pixels inside the layer outline, the 2D core of the layer.
+# Alternating 4 and 8 neighbour erosion steps approximate a round inset.
+def color_core(pixels, radius):
+    core = pixels[..., 3] > 0
+    for step in range(radius):
+        padded = np.pad(core, 1, constant_values=False)
+        core = core & padded[:-2, 1:-1] & padded[2:, 1:-1] & padded[1:-1, :-2] & padded[1:-1, 2:]
+        if step % 2:
+            core &= padded[:-2, :-2] & padded[:-2, 2:] & padded[2:, :-2] & padded[2:, 2:]
+    return core
+
+# Color Thickness in layer image pixels, with an error message when the shell cannot be cut
+def color_shell_radius(scene):
+    if scene.render.image_settings.color_mode != 'RGBA':
+        return 0, "Color shell needs RGBA layer images."
+    pixel_size = layer_pixel_size(scene)
+    if pixel_size is None:
+        return 0, "Color shell needs an orthographic layer camera."
+    return max(1, round(scene.PolySlice_props.color_thickness / pixel_size)), None
+
+# Color Thickness in layers, how far above and below a layer a surface can show through it
+def color_shell_layers(scene):
+    props = scene.PolySlice_props
+    return int(np.ceil(props.color_thickness / props.layer_height))
+
+# The 2D cores of the layer images are kept next to them, so the shell of a layer can be cut
+# again after its neighbours were rendered without rendering the whole stack
+COLOR_CORE_DIRECTORY = "color_cores"
+
+# Reduce the layer images in a directory, or only the given freshly rendered frames, to their
+# color shell. A pixel is only left uninked when it is in the 2D core of every layer within
+# `layers` of its own, otherwise a flat top, bottom or shallow slope above or below would show
+# through it. Nothing lies below the first layer or above `top_frame`, the frames after it
+# repeat the top layer.
+def apply_color_shell(directory, radius, layers, top_frame, frames=None):
+    files = layer_files(directory)
+    frames = sorted(files if frames is None else set(frames) & set(files))
+    core_directory = os.path.join(directory, COLOR_CORE_DIRECTORY)
+    os.makedirs(core_directory, exist_ok=True)
+
+    for frame in frames:
+        if frame <= top_frame:
+            core = color_core(read_image_pixels(files[frame]), radius)
+            np.save(os.path.join(core_directory, f"{frame}.npy"), np.packbits(core, axis=-1))
+
+    # Unpacked cores of the layers around the current one. A core that was never saved is
+    # eroded from the image on disk, which is already reduced to its shell and so only ever
+    # gives a smaller core: more ink, never a white surface
+    cores = {}
+    def layer_core(frame, shape):
+        if frame not in cores:
+            path = os.path.join(core_directory, f"{frame}.npy")
+            if os.path.isfile(path):
+                core = np.unpackbits(np.load(path), axis=-1, count=shape[1]).astype(bool)
+            elif frame in files:
+                core = color_core(read_image_pixels(files[frame]), radius)
+            else:
+                core = None
+            cores[frame] = core if core is not None and core.shape == shape else np.zeros(shape, dtype=bool)
+        return cores[frame]
+
+    for frame in frames:
+        layer = min(frame, top_frame)
+        for old_frame in [old_frame for old_frame in cores if old_frame < layer - layers]:
+            del cores[old_frame]
+        if layer - layers < 1 or layer + layers > top_frame:
+            continue
+        pixels = read_image_pixels(files[frame])
+        core = np.ones(pixels.shape[:2], dtype=bool)
+        for other in range(layer - layers, layer + layers + 1):
+            core &= layer_core(other, core.shape)
+        pixels[core] = 0
+        write_image_pixels(files[frame], pixels)
+
+# How far every pixel of `pixels` lies outside the range of colours/alphas found within one
+# pixel of the same place in `other`, both premultiplied (height, width, 4) arrays. A blend of
+# neighbouring pixels, as on an anti-aliased edge, lies inside that range
+def neighbourhood_diff(pixels, other):
+    height, width = pixels.shape[:2]
+    padded = np.pad(other, ((1, 1), (1, 1), (0, 0)), mode='edge')
+    low = other.copy()
+    high = other.copy()
+    for dy in range(3):
+        for dx in range(3):
+            np.minimum(low, padded[dy:dy + height, dx:dx + width], out=low)
+            np.maximum(high, padded[dy:dy + height, dx:dx + width], out=high)
+    return np.maximum(low - pixels, pixels - high).max(axis=-1)
+
+# Compare one layer against its reference and return the difference metrics
+def compare_layer_pixels(output, reference, pixel_tolerance):
+    resampled = output.shape != reference.shape
+    if resampled:
+        output = resample_pixels(output, reference.shape[0], reference.shape[1])
+
+    # Premultiply so fully transparent pixels compare equal whatever their colour
+    output = np.concatenate((output[..., :3] * output[..., 3:], output[..., 3:]), axis=-1)
+    reference = np.concatenate((reference[..., :3] * reference[..., 3:], reference[..., 3:]), axis=-1)
+    pixel_diff = np.abs(output - reference).max(axis=-1)
+
+    # A pixel only counts as changed when it lies outside the range of the pixels around it in
+    # the other image, both ways round so a missing line is caught as well as an added one.
+    # Anti-aliased edges stay inside that range, shifts of two pixels or more do not
+    changed = (neighbourhood_diff(output, reference) > pixel_tolerance) | (
+        neighbourhood_diff(reference, output) > pixel_tolerance
+    )
+
+    return {
+        "max_diff": float(pixel_diff.max()),
+        "mean_diff": float(pixel_diff.mean()),
+        "changed_pixel_fraction": float((pixel_diff > pixel_tolerance).mean()),
+        "changed_fraction": float(changed.mean()),
+        "resampled": resampled,
+    }
+
+# Compare a rendered layer stack against a reference stack, layer by layer
+def compare_layer_stacks(output_directory, reference_directory, pixel_tolerance, layer_tolerance, edge_tolerance):
+    output_files = layer_files(output_directory)
+    reference_files = layer_files(reference_directory)
+
+    layers = []
+    for frame, reference_path in reference_files.items():
+        output_path = output_files.get(frame)
+        if output_path is None:
+            continue
+        metrics = compare_layer_pixels(
+            read_image_pixels(output_path), read_image_pixels(reference_path), pixel_tolerance
+        )
+        metrics["layer"] = frame
+        metrics["passed"] = (
+            metrics["changed_fraction"] <= layer_tolerance and metrics["changed_pixel_fraction"] <= edge_tolerance
+        )
+        layers.append(metrics)
+
+    missing_layers = sorted(set(reference_files) - set(output_files))
+    extra_layers = sorted(set(output_files) - set(reference_files))
+    failed_layers = [layer["layer"] for layer in layers if not layer["passed"]]
+
+    return {
+        "output_directory": output_directory,
+        "reference_directory": reference_directory,
+        "pixel_tolerance": pixel_tolerance,
+        "layer_tolerance": layer_tolerance,
+        "edge_tolerance": edge_tolerance,
+        "layer_count": len(output_files),
+        "reference_layer_count": len(reference_files),
+        "missing_layers": missing_layers,
+        "extra_layers": extra_layers,
+        "failed_layers": failed_layers,
+        "passed": bool(reference_files) and not (missing_layers or extra_layers or failed_layers),
+        "layers": layers,
+    }
+
+# Texels kept for every layer image pixel when textures are fitted to the layer resolution
+TEXELS_PER_PIXEL = 2.0
+
+# Highest texels per mm any face of the object asks of each image texture in its materials,
+# from the area each face covers in UV space and on the model
+def texture_densities(obj, depsgraph):
+    densities = {}
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = obj_eval.to_mesh()
+    try:
+        if not mesh.uv_layers.active:
+            return densities
+        mesh.calc_loop_triangles()
+        coords = mesh_array(mesh.vertices, "co", np.float32, 3)
+        uvs = mesh_array(mesh.uv_layers.active.data, "uv", np.float32, 2)
+        tri_verts = mesh_array(mesh.loop_triangles, "vertices", np.int32, 3)
+        tri_loops = mesh_array(mesh.loop_triangles, "loops", np.int32, 3)
+        tri_materials = mesh_array(mesh.loop_triangles, "material_index", np.int32)
+    finally:
+        obj_eval.to_mesh_clear()
+
+    matrix = np.array(obj.matrix_world, dtype=np.float32)
+    corners = (coords @ matrix[:3, :3].T + matrix[:3, 3])[tri_verts]
+    world_area = 0.5 * np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1)
+    uv_corners = uvs[tri_loops]
+    uv_edges_a = uv_corners[:, 1] - uv_corners[:, 0]
+    uv_edges_b = uv_corners[:, 2] - uv_corners[:, 0]
+    uv_area = 0.5 * np.abs(uv_edges_a[:, 0] * uv_edges_b[:, 1] - uv_edges_a[:, 1] * uv_edges_b[:, 0])
+
+    # Texels per mm of a triangle is sqrt(texel area / model area), scaled by the image size below
+    valid = world_area > 0
+    density = np.zeros(len(world_area), dtype=np.float32)
+    density[valid] = np.sqrt(uv_area[valid] / world_area[valid])
+
+    for index, slot in enumerate(obj.material_slots):
+        material = slot.material
+        if material is None or not material.use_nodes:
+            continue
+        used = density[tri_materials == index]
+        if not used.size:
+            continue
+        # Use a high percentile so a few badly unwrapped faces do not keep a texture at full size
+        slot_density = float(np.percentile(used, 95))
+        for node in material.node_tree.nodes:
+            if node.type != 'TEX_IMAGE' or node.image is None:
+                continue
+            # Reading the size decodes the image, free it again if it was not loaded before
+            was_loaded = node.image.has_data
+            width, height = node.image.size
+            if not was_loaded:
+                node.image.buffers_free()
+            if width and height:
+                image_density = slot_density * np.sqrt(width * height)
+                densities[node.image] = max(densities.get(node.image, 0.0), image_density)
+    return densities
+
+# Custom properties linking a fitted texture proxy back to the original image it stands in for
+PROXY_ORIGINAL_KEY = "polyslice_original"
+PROXY_FAKE_USER_KEY = "polyslice_original_fake_user"
+
+# Put the original images back into every image texture node showing a fitted proxy and
+# remove the proxies, returning how many nodes were restored
+def restore_textures():
+    restored = 0
+    for material in bpy.data.materials:
+        if not material.use_nodes:
+            continue
+        for node in material.node_tree.nodes:
+            if node.type != 'TEX_IMAGE' or node.image is None:
+                continue
+            original = bpy.data.images.get(node.image.get(PROXY_ORIGINAL_KEY, ""))
+            if original is not None:
+                node.image = original
+                restored += 1
+
+    for proxy in [image for image in bpy.data.images if PROXY_ORIGINAL_KEY in image]:
+        original = bpy.data.images.get(proxy[PROXY_ORIGINAL_KEY])
+        if original is not None:
+            original.use_fake_user = bool(proxy.get(PROXY_FAKE_USER_KEY, False))
+        if proxy.users == 0:
+            bpy.data.images.remove(proxy)
+    return restored
+
+# Number of layer images the ink estimate holds in memory at a time
+ESTIMATE_CHUNK = 4
+
+# Covered area, cyan/magenta/yellow ink volume and head passes of a stack of
+# layer images, (layers, height, width, 4), computed for all layers at once
+def estimate_layer_ink(stack, pixel_size, ink_per_mm2, swath_width):
+    pixel_area = pixel_size * pixel_size
+    alpha = stack[..., 3]
+    covered = alpha > 0
+    area = covered.sum(axis=(1, 2)) * pixel_area
+
+    # Subtractive ink needed for each channel, scaled by how opaque the pixel is
+    ink = ((1.0 - stack[..., :3]) * alpha[..., None]).sum(axis=(1, 2), dtype=np.float64) * pixel_area * ink_per_mm2
+
+    # One pass for every swath wide band of rows that has any ink in it
+    swath_rows = max(1, int(round(swath_width / pixel_size)))
+    inked_rows = covered.any(axis=2)
+    padding = -inked_rows.shape[1] % swath_rows
+    inked_rows = np.pad(inked_rows, ((0, 0), (0, padding)))
+    passes = inked_rows.reshape(len(stack), -1, swath_rows).any(axis=2).sum(axis=1)
+
+    return area, ink, passes
+
+# Preview atlas of all layers, saved next to the layer images
+PREVIEW_ATLAS_NAME = "preview_atlas.npy"
+
+# Icons showing the layer preview in the panel, created in register()
+preview_collection = None
+
+# Memory map of the preview atlas that is shown, reopened when the atlas is rebuilt
+preview_atlas_cache = {"path": None, "mtime": None, "atlas": None}
+
+# Area average downsample of an (height, width, 4) array, nearest neighbour when enlarging
+def downsample_pixels(pixels, height, width):
+    if height > pixels.shape[0] or width > pixels.shape[1]:
+        return resample_pixels(pixels, height, width)
+    rows = np.arange(height + 1) * pixels.shape[0] // height
+    cols = np.arange(width + 1) * pixels.shape[1] // width
+    summed = np.add.reduceat(np.add.reduceat(pixels, rows[:-1], axis=0), cols[:-1], axis=1)
+    return summed / (np.diff(rows)[:, None, None] * np.diff(cols)[None, :, None])
+
+# Open the preview atlas of an output directory as a read only memory map
+def load_preview_atlas(output_directory):
+    path = os.path.join(bpy.path.abspath(output_directory), PREVIEW_ATLAS_NAME)
+    if not os.path.isfile(path):
+        return None
+    mtime = os.path.getmtime(path)
+    if preview_atlas_cache["path"] != path or preview_atlas_cache["mtime"] != mtime:
+        preview_atlas_cache.update(path=path, mtime=mtime, atlas=np.load(path, mmap_mode='r'))
+    return preview_atlas_cache["atlas"]
+
+# Show (height, width, 4) uint8 pixels as a panel icon
+def set_preview_image(name, pixels):
+    preview = preview_collection.get(name) or preview_collection.new(name)
+    height, width = pixels.shape[:2]
+    preview.image_size = (width, height)
+    preview.image_pixels_float.foreach_set((pixels.astype(np.float32) / 255).ravel())
+
+# Show the selected layer and a side cross-section through every layer from the atlas
+def show_preview(props):
+    atlas = load_preview_atlas(props.output_directory)
+    if atlas is None or preview_collection is None or not len(atlas):
+        return
+    layer = min(props.preview_layer, len(atlas)) - 1
+    set_preview_image("layer", atlas[layer])
+    column = min(int(props.preview_position * atlas.shape[2]), atlas.shape[2] - 1)
+    side = atlas[:, :, column]
+
+    # One row per layer would stretch the side view, so pick the layer at the height of each
+    # row of preview pixels instead
+    pixel_size = layer_pixel_size(props.id_data, atlas.shape[1:3])
+    if pixel_size is not None:
+        tops = props.first_layer_height + props.layer_height * np.arange(len(atlas))
+        rows = max(1, round(tops[-1] / pixel_size))
+        centers = (np.arange(rows) + 0.5) * tops[-1] / rows
+        side = side[np.minimum(np.searchsorted(tops, centers), len(atlas) - 1)]
+    set_preview_image("side", side)
+
+# Slicing works on this many layers at a time so each bisect only sees a thin part of the model
+LAYERS_PER_CHUNK = 16
+
+# foreach_get field and width for each attribute data type copied into the layer meshes
+ATTRIBUTE_FIELDS = {
+    'FLOAT': ("value", 1, np.float32),
+    'INT': ("value", 1, np.int32),
+    'INT8': ("value", 1, np.int32),
+    'BOOLEAN': ("value", 1, np.bool_),
+    'FLOAT2': ("vector", 2, np.float32),
+    'FLOAT_VECTOR': ("vector", 3, np.float32),
+    'FLOAT_COLOR': ("color", 4, np.float32),
+    'BYTE_COLOR': ("color", 4, np.float32),
+}
+
+# Read a property of every item in a mesh collection into a numpy array
+def mesh_array(collection, attribute, dtype, width=1):
+    data = np.empty(len(collection) * width, dtype=dtype)
+    collection.foreach_get(attribute, data)
+    return data.reshape(-1, width) if width > 1 else data
+
+# Read the geometry of a mesh into numpy arrays: positions, polygons, materials,
+# UV maps and the colour/generic attributes that are copied into the layer meshes
+def mesh_arrays(mesh):
+    attributes = []
+    for attribute in mesh.attributes:
+        if attribute.name.startswith(".") or attribute.name == "position":
+            continue
+        if attribute.domain not in ('POINT', 'FACE', 'CORNER') or attribute.data_type not in ATTRIBUTE_FIELDS:
+            continue
+        field, width, dtype = ATTRIBUTE_FIELDS[attribute.data_type]
+        values = mesh_array(attribute.data, field, dtype, width)
+        attributes.append((attribute.name, attribute.data_type, attribute.domain, values))
+
+    return {
+        "co": mesh_array(mesh.vertices, "co", np.float32, 3),
+        "loop_verts": mesh_array(mesh.loops, "vertex_index", np.int32),
+        "loop_starts": mesh_array(mesh.polygons, "loop_start", np.int32),
+        "loop_totals": mesh_array(mesh.polygons, "loop_total", np.int32),
+        "attributes": attributes,
+        "materials": list(mesh.materials),
+        "uv_layers": [uv_layer.name for uv_layer in mesh.uv_layers],
+        "active_uv": mesh.uv_layers.active.name if mesh.uv_layers.active else None,
+        "active_color": mesh.color_attributes.active_color_name,
+    }
+
+# Mesh arrays holding only the polygons where `poly_mask` is set
+def subset_mesh_arrays(arrays, poly_mask):
+    polys = np.flatnonzero(poly_mask)
+    totals = arrays["loop_totals"][polys]
+    starts = np.zeros(len(polys), dtype=np.int32)
+    np.cumsum(totals[:-1], out=starts[1:])
+    loops = np.repeat(arrays["loop_starts"][polys] - starts, totals) + np.arange(totals.sum(), dtype=np.int32)
+    verts, loop_verts = np.unique(arrays["loop_verts"][loops], return_inverse=True)
+
+    domain_index = {'POINT': verts, 'FACE': polys, 'CORNER': loops}
+    return dict(
+        arrays,
+        co=arrays["co"][verts],
+        loop_verts=loop_verts.astype(np.int32),
+        loop_starts=starts,
+        loop_totals=totals,
+        attributes=[
+            (name, data_type, domain, values[domain_index[domain]])
+            for name, data_type, domain, values in arrays["attributes"]
+        ],
+    )
+
+# Build a new mesh from mesh arrays
+def mesh_from_arrays(arrays, name):
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(arrays["co"]))
+    mesh.loops.add(len(arrays["loop_verts"]))
+    mesh.polygons.add(len(arrays["loop_starts"]))
+    mesh.vertices.foreach_set("co", arrays["co"].ravel())
+    mesh.loops.foreach_set("vertex_index", arrays["loop_verts"])
+    mesh.polygons.foreach_set("loop_start", arrays["loop_starts"])
+
+    for material in arrays["materials"]:
+        mesh.materials.append(material)
+    for uv_name in arrays["uv_layers"]:
+        mesh.uv_layers.new(name=uv_name, do_init=False)
+    for name, data_type, domain, values in arrays["attributes"]:
+        field = ATTRIBUTE_FIELDS[data_type][0]
+        target = mesh.attributes.get(name)
+        if target is None:
+            target = mesh.attributes.new(name, data_type, domain)
+        target.data.foreach_set(field, values.ravel())
+
+    if arrays["active_uv"]:
+        mesh.uv_layers.active = mesh.uv_layers[arrays["active_uv"]]
+    if arrays["active_color"]:
+        mesh.color_attributes.active_color_name = arrays["active_color"]
+
+    mesh.update(calc_edges=True)
+    return mesh
+
+# Z height of the boundaries between layers: the first layer, then one layer height per layer
+def layer_boundaries(min_z, max_z, first_layer_height, layer_height):
+    count = 1 + max(0, int(np.ceil((max_z - min_z - first_layer_height) / layer_height)))
+    return np.concatenate(([min_z], min_z + first_layer_height + layer_height * np.arange(count)))
+
+# Lowest, highest and mean Z of every polygon in mesh arrays
+def polygon_z_range(arrays):
+    loop_starts = arrays["loop_starts"]
+    if not len(loop_starts):
+        empty = np.empty(0, dtype=np.float32)
+        return empty, empty, empty
+    corner_z = arrays["co"][arrays["loop_verts"], 2]
+    return (
+        np.minimum.reduceat(corner_z, loop_starts),
+        np.maximum.reduceat(corner_z, loop_starts),
+        np.add.reduceat(corner_z, loop_starts) / arrays["loop_totals"],
+    )
+
+# Cut the model in `arrays` at the layer boundaries and return {layer index: mesh of that layer}
+# for the requested layers. The model is cleaned up and cut a few layers at a time, and
+# `arrays` is shrunk in place as the cut moves up so the model is never held twice.
+def slice_layer_meshes(arrays, boundaries, layers, name):
+    layer_count = len(boundaries) - 1
+    layers = sorted(layers)
+    poly_min_z, poly_max_z, _ = polygon_z_range(arrays)
+    layer_meshes = {}
+
+    chunks = [list(group) for _, group in groupby(enumerate(layers), key=lambda item: item[1] - item[0])]
+    chunks = [
+        [layer for _, layer in run[start:start + LAYERS_PER_CHUNK]]
+        for run in chunks for start in range(0, len(run), LAYERS_PER_CHUNK)
+    ]
+    for chunk in chunks:
+        low_z = boundaries[chunk[0]]
+        high_z = boundaries[chunk[-1] + 1]
+        part = mesh_from_arrays(subset_mesh_arrays(arrays, (poly_max_z >= low_z) & (poly_min_z <= high_z)), name)
+
+        # Same clean up as the regular slice: merge doubles, fill holes and recalculate normals.
+        # Holes filled along the open edges of the part lie outside the chunk and are dropped below.
+        bm = bmesh.new()
+        bm.from_mesh(part)
+        bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
+        bmesh.ops.holes_fill(bm, edges=bm.edges, sides=4)
+        bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
+        for z in boundaries[chunk[0]:chunk[-1] + 2]:
+            bmesh.ops.bisect_plane(
+                bm,
+                geom=bm.verts[:] + bm.edges[:] + bm.faces[:],
+                plane_co=Vector((0, 0, z)),
+                plane_no=Vector((0, 0, 1)),
+            )
+        bm.to_mesh(part)
+        bm.free()
+        part_arrays = mesh_arrays(part)
+        bpy.data.meshes.remove(part)
+
+        _, _, centers = polygon_z_range(part_arrays)
+        poly_layers = np.clip(np.searchsorted(boundaries, centers, side='right') - 1, 0, layer_count - 1)
+        for layer in chunk:
+            layer_arrays = subset_mesh_arrays(part_arrays, poly_layers == layer)
+            layer_meshes[layer] = mesh_from_arrays(layer_arrays, f"{name}.{layer + 1:03d}")
+        del part_arrays
+
+        # Later chunks lie higher, so polygons below this one are no longer needed.
+        # Drop them once they make up most of what is left.
+        done = poly_max_z < high_z
+        if done.sum() * 2 > len(done):
+            arrays.update(subset_mesh_arrays(arrays, ~done))
+            poly_min_z, poly_max_z, _ = polygon_z_range(arrays)
+
+    return layer_meshes
+
+# Objects saved to the STL file that is sliced with the filament slicer
+STL_OBJECT_NAMES = ("poly_stl_clone", "CalibrationTower", "Position")
+
+# Binary STL triangle: normal, three vertices and the unused attribute byte count
+STL_TRIANGLE = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
+
+# Triangles of an evaluated object in world space as STL triangle records, built the way
+# Blender's STL exporter builds them: the mesh is transformed and, under a negative scale,
+# flipped by Blender before it is triangulated, and each normal is the Newell normal that
+# mathutils.geometry.normal() computes, in single precision and the same operation order
+def stl_triangles(obj, depsgraph):
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = obj_eval.to_mesh()
+    try:
+        mesh.transform(obj.matrix_world)
+        if obj.matrix_world.is_negative:
+            mesh.flip_normals()
+        mesh.calc_loop_triangles()
+        coords = mesh_array(mesh.vertices, "co", np.float32, 3)
+        triangles = mesh_array(mesh.loop_triangles, "vertices", np.int32, 3)
+    finally:
+        obj_eval.to_mesh_clear()
+    corners = coords[triangles]
+
+    # Newell's method sums over the edges (v2, v0), (v0, v1), (v1, v2)
+    normals = np.zeros((len(triangles), 3), dtype=np.float32)
+    for previous, current in ((2, 0), (0, 1), (1, 2)):
+        v_prev = corners[:, previous]
+        v_curr = corners[:, current]
+        normals[:, 0] += (v_prev[:, 1] - v_curr[:, 1]) * (v_prev[:, 2] + v_curr[:, 2])
+        normals[:, 1] += (v_prev[:, 2] - v_curr[:, 2]) * (v_prev[:, 0] + v_curr[:, 0])
+        normals[:, 2] += (v_prev[:, 0] - v_curr[:, 0]) * (v_prev[:, 1] + v_curr[:, 1])
+    length_squared = normals[:, 0] * normals[:, 0] + normals[:, 1] * normals[:, 1] + normals[:, 2] * normals[:, 2]
+    valid = length_squared > np.float32(1e-35)
+    scale = np.float32(1.0) / np.sqrt(np.where(valid, length_squared, np.float32(1.0)))
+    normals = np.where(valid[:, None], normals * scale[:, None], np.float32(0.0))
+
+    records = np.zeros(len(triangles), dtype=STL_TRIANGLE)
+    records["normal"] = normals
+    records["vertices"] = corners
+    return records
+
+# Write STL triangle records as a binary STL file
+def write_binary_stl(filepath, records):
+    header = ("Exported from Blender-" + bpy.app.version_string).encode("ascii")[:80].ljust(80, b"\0")
+    with open(filepath, "wb") as stl_file:
+        stl_file.write(header + np.array(len(records), dtype="<u4").tobytes())
+        records.tofile(stl_file)
+
+# Write the STL file on a background thread. The result is printed and shown in the
+# panel from the main thread once the write has finished.
+def write_binary_stl_in_background(scene, filepath, records):
+    scene_name = scene.name
+    result = {}
+
+    def write():
+        try:
+            write_binary_stl(filepath, records)
+        except Exception as error:
+            result["error"] = error
+
+    def report_result():
+        if thread.is_alive():
+            return 0.5
+        if "error" in result:
+            status = f"Failed to save STL '{filepath}': {result['error']}"
+        else:
+            status = f"Saved STL '{filepath}'."
+        print(status)
+        scene = bpy.data.scenes.get(scene_name)
+        if scene is not None:
+            scene.PolySlice_props.stl_status = status
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
+        return None
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    bpy.app.timers.register(report_result, first_interval=0.5)
+
+# Scene custom properties that record the last low memory slice for incremental re-slicing
+SLICE_STATE_KEYS = (
+    "polyslice_source",
+    "polyslice_boundaries",
+    "polyslice_dirty_layers",
+    "polyslice_render_settings",
+    "polyslice_rendered_frame_end",
+)
+
+# Everything the layer images on disk depend on besides the layers themselves. An incremental
+# render can only keep the images that were rendered with the same settings
+def layer_render_settings(scene):
+    props = scene.PolySlice_props
+    render = scene.render
+    camera = scene.camera
+    settings = {
+        "output_directory": bpy.path.abspath(props.output_directory),
+        "resolution": [render.resolution_x, render.resolution_y, render.resolution_percentage],
+        "color_mode": render.image_settings.color_mode,
+        "camera": None,
+        "color_shell": [props.color_thickness, props.layer_height] if props.color_shell_only else None,
+    }
+    if camera is not None:
+        settings["camera"] = {
+            "name": camera.name,
+            "matrix": [list(row) for row in camera.matrix_world],
+            "ortho_scale": camera.data.ortho_scale if camera.type == 'CAMERA' else None,
+        }
+    return json.dumps(settings, sort_keys=True)
+
+# Constants for mixing 64 bit hashes
+HASH_PRIMES = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93], dtype=np.uint64)
+
+# Fingerprint of the part of the model each layer is cut from: the sum of a hash of the
+# positions and of every attribute copied into the layer meshes (UVs, colors, materials and
+# generic attributes) of every polygon that reaches into the layer
+def layer_hashes(arrays, boundaries):
+    layer_count = len(boundaries) - 1
+    hashes = np.zeros(layer_count, dtype=np.uint64)
+    if not len(arrays["loop_starts"]):
+        return hashes
+
+    coords = np.round(arrays["co"] * 1e4).astype(np.int64).view(np.uint64)
+    corners = coords[arrays["loop_verts"]]
+    corner_hash = corners[:, 0] * HASH_PRIMES[0] ^ corners[:, 1] * HASH_PRIMES[1] ^ corners[:, 2] * HASH_PRIMES[2]
+    face_hash = np.zeros(len(arrays["loop_starts"]), dtype=np.uint64)
+    for name, data_type, domain, values in arrays["attributes"]:
+        values = values.reshape(len(values), -1)
+        if values.dtype.kind == 'f':
+            values = np.round(values * 1e5)
+        values = values.astype(np.int64).view(np.uint64)
+        value_hash = np.zeros(len(values), dtype=np.uint64)
+        for column in range(values.shape[1]):
+            value_hash ^= values[:, column] * HASH_PRIMES[column]
+        # Point values reach a polygon through its corners
+        if domain == 'FACE':
+            face_hash = face_hash * HASH_PRIMES[3] + value_hash
+        elif domain == 'POINT':
+            corner_hash = corner_hash * HASH_PRIMES[3] + value_hash[arrays["loop_verts"]]
+        else:
+            corner_hash = corner_hash * HASH_PRIMES[3] + value_hash
+
+    poly_hash = np.add.reduceat(corner_hash, arrays["loop_starts"]) * HASH_PRIMES[2] + face_hash
+    poly_hash ^= poly_hash >> np.uint64(29)
+    poly_hash *= HASH_PRIMES[3]
+
+    # Add every polygon to each layer between its lowest and highest point
+    poly_min_z, poly_max_z, _ = polygon_z_range(arrays)
+    first = np.clip(np.searchsorted(boundaries, poly_min_z, side='right') - 1, 0, layer_count - 1)
+    last = np.clip(np.searchsorted(boundaries, poly_max_z, side='right') - 1, 0, layer_count - 1)
+    counts = last - first + 1
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    layers = np.repeat(first, counts) + np.arange(counts.sum()) - offsets
+    np.add.at(hashes, layers, np.repeat(poly_hash, counts))
+    return hashes
+
+# Render single layer frames to the output path, leaving the other layer images in place,
+# and remove the images of layers that no longer exist
+def render_layer_frames(scene, frames):
+    frames = set(frames)
+    # The frame after the top layer repeats the top layer
+    if scene.frame_end - 1 in frames:
+        frames.add(scene.frame_end)
+
+    current_frame = scene.frame_current
+    for frame in sorted(frames):
+        scene.frame_set(frame)
+        bpy.ops.render.render(write_still=True)
+    scene.frame_set(current_frame)
+
+    directory = os.path.dirname(scene.render.frame_path(frame=1))
+    for frame, path in layer_files(directory).items():
+        if frame > scene.frame_end:
+            os.remove(path)
+    return sorted(frames)
+
+# Keyframe hide_render so each layer object only renders on its own frame
+def keyframe_layer_visibility(layer_objects):
+    for frame, obj in enumerate(layer_objects, start=1):
+        if obj.animation_data and obj.animation_data.action:
+            fcurve = obj.animation_data.action.fcurves.find("hide_render")
+            if fcurve:
+                obj.animation_data.action.fcurves.remove(fcurve)
+        if frame > 1:
+            obj.hide_render = True
+            obj.keyframe_insert("hide_render", frame=1)
+        obj.hide_render = False
+        obj.keyframe_insert("hide_render", frame=frame)
+        if frame < len(layer_objects):
+            obj.hide_render = True
+            obj.keyframe_insert("hide_render", frame=frame + 1)
+    bpy.context.scene.frame_end = len(layer_objects) + 1
+
+# Move the top of the calibration tower to the top of the model
+def fit_calibration_tower(height):
+    tower = bpy.data.objects["CalibrationTower"]
+    matrix = tower.matrix_world
+    inverse = matrix.inverted()
+    top_vertices = sorted(tower.data.vertices, key=lambda v: (matrix @ v.co).z, reverse=True)[:6]
+    for v in top_vertices:
+        world_vertex_position = matrix @ v.co
+        world_vertex_position.z = height
+        v.co = inverse @ world_vertex_position
+    tower.data.update()
+
+# Render the 300x300 top view of the model to Render.png through CamRender
+def render_preview(context, output_directory):
+    render = context.scene.render
+
+    # Store the original resolution, file format and color mode
+    original_resolution_x = render.resolution_x
+    original_resolution_y = render.resolution_y
+    original_file_format = render.image_settings.file_format
+    original_color_mode = render.image_settings.color_mode
+
+    # Set the output resolution and format temporarily
+    render.resolution_x = 300
+    render.resolution_y = 300
+    render.filepath = output_directory+"#"
+    render.image_settings.file_format = 'PNG'
+    render.image_settings.color_mode = 'RGBA'
+    render.film_transparent = True
+
+    # Set the output file path
+    old_path = render.filepath
+    render.filepath = render.filepath[:-1]+'/Render.png'
+
+    # Set the camera to render from
+    camera = bpy.data.objects.get('CamRender')
+    if camera:
+        context.scene.camera = camera
+    else:
+        raise Exception("Camera 'CamRender' not found")
+
+    # Render the image
+    render.use_compositing = False
+    bpy.ops.render.render(write_still=True, use_viewport=True)
+
+    # Restore the original resolution, file format, color mode and compositing setting
+    render.resolution_x = original_resolution_x
+    render.resolution_y = original_resolution_y
+    render.image_settings.file_format = original_file_format
+    render.image_settings.color_mode = original_color_mode
+    render.use_compositing = True
+    render.filepath = old_path
+
+    # Set the camera to render the layers from
+    camera = bpy.data.objects.get('Camera')
+    if camera:
+        context.scene.camera = camera
+    else:
+        raise Exception("Camera 'Camera' not found")
 
 # Operator for "Trim Bottom" button
 class OBJECT_OT_trim_bottom(Operator):
@@ -191,6 +1130,7 @@ class OBJECT_OT_slice(Operator):
     bl_description = "Slice the model into color layers that will be interlaced between filament layers"
 
     def execute(self, context):
+        start_time = time.perf_counter()
         props = context.scene.PolySlice_props
         color_thickness = props.color_thickness
         output_directory = props.output_directory
@@ -204,6 +1144,12 @@ class OBJECT_OT_slice(Operator):
             self.report({'ERROR'}, "No objects selected.")
             return {'CANCELLED'}
 
+        # A low memory slice leaves poly_stl_clone sharing the model's mesh, which would stop the
+        # transforms from being applied and be exported instead of the clone made below
+        clone = bpy.data.objects.get("poly_stl_clone")
+        if clone is not None and clone not in context.selected_objects and clone.data is context.selected_objects[0].data:
+            bpy.data.objects.remove(clone)
+
         tempsel = context.selected_objects
         bpy.ops.object.transform_apply(location=False, rotation=True, scale=True)
 
@@ -275,65 +1221,10 @@ class OBJECT_OT_slice(Operator):
 
         bpy.context.object.hide_render = False
 
-        # Store the original resolution
-        original_resolution_x = bpy.context.scene.render.resolution_x
-        original_resolution_y = bpy.context.scene.render.resolution_y
-
-        # Store the original file format
-        original_file_format = bpy.context.scene.render.image_settings.file_format
-
-        # Set the output resolution temporarily
-        bpy.context.scene.render.resolution_x = 300
-        bpy.context.scene.render.resolution_y = 300
         if not output_directory:
             self.report({'ERROR'}, "No output path selected.")
             return {'CANCELLED'}
-        bpy.context.scene.render.filepath = output_directory+"#"
-
-        # Set the output file format to JPG
-        original_file_format = bpy.context.scene.render.image_settings.file_format
-        bpy.context.scene.render.image_settings.file_format = 'PNG'
-        original_color_mode = bpy.context.scene.render.image_settings.color_mode
-
-        bpy.context.scene.render.image_settings.file_format = 'PNG'
-        bpy.context.scene.render.image_settings.color_mode = 'RGBA'
-        bpy.context.scene.render.film_transparent = True
-
-        # Set the output file path
-        old_path = bpy.context.scene.render.filepath
-        output_path = bpy.context.scene.render.filepath[:-1]+'/Render.png'  
-        bpy.context.scene.render.filepath = output_path
-
-        # Set the camera to render from
-        camera = bpy.data.objects.get('CamRender')
-        if camera:
-            bpy.context.scene.camera = camera
-        else:
-            raise Exception("Camera 'CamRender' not found")
-
-        # Render the image
-        bpy.context.scene.render.use_compositing = False
-        bpy.ops.render.render(write_still=True, use_viewport=True)
-
-
-        # Restore the original resolution, file format, and color mode
-        bpy.context.scene.render.resolution_x = original_resolution_x
-        bpy.context.scene.render.resolution_y = original_resolution_y
-        bpy.context.scene.render.image_settings.file_format = original_file_format
-        bpy.context.scene.render.image_settings.color_mode = original_color_mode
-
-        # Restore the compositing setting
-        bpy.context.scene.render.use_compositing = True
-        bpy.context.scene.render.filepath = old_path
-
-        #print(f"Render saved to {output_path}")
-
-        # Set the camera to render from
-        camera = bpy.data.objects.get('Camera')
-        if camera:
-            bpy.context.scene.camera = camera
-        else:
-            raise Exception("Camera 'CamRender' not found")
+        render_preview(context, output_directory)
 
 
         #Apply all transforms
@@ -399,8 +1290,9 @@ class OBJECT_OT_slice(Operator):
             
         ############BOOLEAN
         def slice_and_separate_object(obj, slice_thickness, fs):
-            # Set the context to 3D View and enter edit mode
-            bpy.context.area.ui_type = 'VIEW_3D'
+            # Set the context to 3D View and enter edit mode (there is no area when running headless)
+            if bpy.context.area:
+                bpy.context.area.ui_type = 'VIEW_3D'
             bpy.context.view_layer.objects.active = obj
             obj.select_set(True)
             bpy.ops.object.mode_set(mode='EDIT')
@@ -691,21 +1583,7 @@ class OBJECT_OT_slice(Operator):
             
         #Slices the object
 
-        x = 1
-        for i in selected_objects:
-            objnamei = i.name
-                
-            bpy.data.objects[objnamei].hide_render = False
-            bpy.data.objects[objnamei].keyframe_insert("hide_render", frame=x)
-            for k in selected_objects:
-                objnamek = k.name
-                
-                if (i.name != k.name):                
-                    bpy.data.objects[objnamek].hide_render = True
-                    bpy.data.objects[objnamek].keyframe_insert("hide_render", frame=x)
-            x += 1
-
-        bpy.context.scene.frame_end = x
+        keyframe_layer_visibility(selected_objects)
 
         for obj in selected_objects:
             obj.select_set(True)
@@ -729,12 +1607,236 @@ class OBJECT_OT_slice(Operator):
         bpy.ops.object.make_links_data(type='MODIFIERS')
             
 
-        
+        props.last_slice_time = time.perf_counter() - start_time
+
+        # Layers from this slice are not tracked for incremental re-slicing
+        for key in SLICE_STATE_KEYS:
+            context.scene.pop(key, None)
             
             
 
         return {'FINISHED'}        
 
+# Operator for "Slice!" button in low memory mode
+class OBJECT_OT_slice_low_memory(Operator):
+    bl_idname = "object.slice_low_memory"
+    bl_label = "Slice (Low Memory)"
+    bl_options = {"REGISTER"}
+    bl_description = "Slice the evaluated model into color layers without duplicating or changing it and without an undo step"
+
+    def execute(self, context):
+        start_time = time.perf_counter()
+        props = context.scene.PolySlice_props
+        output_directory = props.output_directory
+
+        # Error checking
+        if not context.selected_objects:
+            self.report({'ERROR'}, "No objects selected.")
+            return {'CANCELLED'}
+        if not output_directory:
+            self.report({'ERROR'}, "No output path selected.")
+            return {'CANCELLED'}
+
+        reference_obj = context.selected_objects[0]
+        if reference_obj.type != 'MESH':
+            self.report({'ERROR'}, f"Object '{reference_obj.name}' is not a mesh.")
+            return {'CANCELLED'}
+        if reference_obj.mode == 'EDIT':
+            reference_obj.update_from_editmode()
+
+        # A clone from an earlier low memory slice only shares the model's mesh and can go,
+        # a full copy left by the regular slice may be the only copy of the model
+        clone = bpy.data.objects.get("poly_stl_clone")
+        if clone is not None and clone is not reference_obj:
+            if clone.data is not reference_obj.data:
+                self.report({'ERROR'}, "'poly_stl_clone' from an earlier slice already exists. Remove or rename it first.")
+                return {'CANCELLED'}
+            bpy.data.objects.remove(clone)
+            clone = None
+
+        # Private world space arrays of the evaluated model, the model itself is never edited
+        depsgraph = context.evaluated_depsgraph_get()
+        reference_eval = reference_obj.evaluated_get(depsgraph)
+        try:
+            source = mesh_arrays(reference_eval.to_mesh(preserve_all_data_layers=True, depsgraph=depsgraph))
+        finally:
+            reference_eval.to_mesh_clear()
+        matrix = np.array(reference_obj.matrix_world, dtype=np.float32)
+        source["co"] = source["co"] @ matrix[:3, :3].T + matrix[:3, 3]
+
+        if not len(source["loop_starts"]):
+            self.report({'ERROR'}, f"Object '{reference_obj.name}' has no faces.")
+            return {'CANCELLED'}
+
+        min_z, max_z = float(source["co"][:, 2].min()), float(source["co"][:, 2].max())
+
+        boundaries = layer_boundaries(min_z, max_z, props.first_layer_height, props.layer_height)
+        layer_count = len(boundaries) - 1
+        hashes = [f"{int(value):016x}" for value in layer_hashes(source, boundaries)]
+
+        # Layers of the previous slice, by layer index
+        previous_layers = {}
+        for obj in bpy.data.objects:
+            match = re.match(r'MyFrames\.(\d+)$', obj.name)
+            if match:
+                previous_layers[int(match.group(1)) - 1] = obj
+
+        # Layers can only be kept when the same model was sliced with the same layer heights
+        scene = context.scene
+        previous_boundaries = np.array(scene.get("polyslice_boundaries", []), dtype=np.float64)
+        common = min(len(previous_boundaries), len(boundaries))
+        incremental = (
+            props.incremental_slice
+            and scene.get("polyslice_source") == reference_obj.name
+            and common > 1
+            and np.array_equal(previous_boundaries[:common], boundaries[:common])
+        )
+        if incremental:
+            dirty_layers = [
+                layer for layer in range(layer_count)
+                if layer not in previous_layers or previous_layers[layer].get("polyslice_hash") != hashes[layer]
+            ]
+        else:
+            dirty_layers = list(range(layer_count))
+
+        # Remove the previous layers that changed or no longer exist
+        for layer, obj in list(previous_layers.items()):
+            if layer in dirty_layers or layer >= layer_count or not incremental:
+                mesh = obj.data
+                bpy.data.objects.remove(obj)
+                if mesh is not None and mesh.users == 0:
+                    bpy.data.meshes.remove(mesh)
+                del previous_layers[layer]
+
+        fit_calibration_tower(max_z)
+
+        if dirty_layers:
+            reference_obj.hide_render = False
+            render_preview(context, output_directory)
+
+        # The exported STL comes from poly_stl_clone, a linked copy sharing the model's mesh
+        if clone is None:
+            clone = reference_obj.copy()
+            clone.name = "poly_stl_clone"
+            for collection in reference_obj.users_collection:
+                collection.objects.link(clone)
+        clone.hide_render = True
+        reference_obj.hide_render = True
+
+        layer_meshes = slice_layer_meshes(source, boundaries, dirty_layers, "MyFrames")
+        del source
+
+        node_group = bpy.data.node_groups.get('Geometry Nodes')
+        if not node_group:
+            print("Node group not found")
+
+        if reference_obj.users_collection:
+            collection = reference_obj.users_collection[0]
+        else:
+            collection = context.scene.collection
+        layer_objects = dict(previous_layers)
+        for layer, mesh in layer_meshes.items():
+            obj = bpy.data.objects.new(f"MyFrames.{layer + 1:03d}", mesh)
+            collection.objects.link(obj)
+            if node_group:
+                modifier = obj.modifiers.new(name="GeometryNodes", type='NODES')
+                modifier.node_group = node_group
+            obj["polyslice_hash"] = hashes[layer]
+            layer_objects[layer] = obj
+
+        keyframe_layer_visibility([layer_objects[layer] for layer in sorted(layer_objects)])
+
+        # Remember the slice so the next one can keep unchanged layers and the render can skip them
+        scene["polyslice_source"] = reference_obj.name
+        scene["polyslice_boundaries"] = boundaries.tolist()
+        # Frames still waiting for a render from an earlier slice stay dirty unless they no longer exist
+        dirty_frames = {layer + 1 for layer in dirty_layers}
+        if incremental:
+            dirty_frames.update(frame for frame in scene.get("polyslice_dirty_layers", []) if frame <= layer_count)
+        scene["polyslice_dirty_layers"] = sorted(dirty_frames)
+
+        props.last_slice_time = time.perf_counter() - start_time
+        self.report({'INFO'}, f"Sliced {len(dirty_layers)} of {layer_count} layers.")
+        return {'FINISHED'}
+
+# Operator for "Fit Textures" button
+class OBJECT_OT_fit_textures(Operator):
+    bl_idname = "object.fit_textures"
+    bl_label = "Fit Textures"
+    bl_options = {"REGISTER"}
+    bl_description = "Swap the textures of the selected models for copies scaled down to the detail the layer images can show, to save memory while slicing and rendering. The original images are kept for Restore Textures"
+
+    def execute(self, context):
+        # Error checking
+        models = [obj for obj in context.selected_objects if obj.type == 'MESH']
+        if not models:
+            self.report({'ERROR'}, "No mesh objects selected.")
+            return {'CANCELLED'}
+        pixel_size = layer_pixel_size(context.scene)
+        if pixel_size is None:
+            self.report({'ERROR'}, "Fitting textures needs an orthographic layer camera.")
+            return {'CANCELLED'}
+
+        # Always fit from the originals, so fitting again after a camera change can bring detail back
+        restore_textures()
+
+        depsgraph = context.evaluated_depsgraph_get()
+        densities = {}
+        for obj in models:
+            for image, density in texture_densities(obj, depsgraph).items():
+                densities[image] = max(densities.get(image, 0.0), density)
+
+        # Only the proxies are scaled, the originals stay untouched and are kept alive by a fake user.
+        # Proxies are made one at a time, so at most one full size texture is decoded at once
+        target_density = TEXELS_PER_PIXEL / pixel_size
+        proxies = {}
+        saved_bytes = 0
+        for image, density in densities.items():
+            scale = target_density / density if density > 0 else 1.0
+            if scale >= 1.0:
+                continue
+            was_loaded = image.has_data
+            width, height = image.size
+            new_width = max(1, int(round(width * scale)))
+            new_height = max(1, int(round(height * scale)))
+            proxy = image.copy()
+            proxy.name = image.name + " (fitted)"
+            proxy.scale(new_width, new_height)
+            # Pack the scaled pixels so the proxy survives saving and reopening the blend file
+            proxy.pack()
+            proxy[PROXY_ORIGINAL_KEY] = image.name
+            proxy[PROXY_FAKE_USER_KEY] = image.use_fake_user
+            image.use_fake_user = True
+            if not was_loaded:
+                image.buffers_free()
+            proxies[image] = proxy
+            bytes_per_pixel = 16 if image.is_float else 4
+            saved_bytes += (width * height - new_width * new_height) * bytes_per_pixel
+
+        for obj in models:
+            for slot in obj.material_slots:
+                material = slot.material
+                if material is None or not material.use_nodes:
+                    continue
+                for node in material.node_tree.nodes:
+                    if node.type == 'TEX_IMAGE' and node.image in proxies:
+                        node.image = proxies[node.image]
+
+        self.report({'INFO'}, f"Fitted {len(proxies)} of {len(densities)} textures, saving {saved_bytes / 2**20:.0f} MB.")
+        return {'FINISHED'}
+
+# Operator for "Restore Textures" button
+class OBJECT_OT_restore_textures(Operator):
+    bl_idname = "object.restore_textures"
+    bl_label = "Restore Textures"
+    bl_options = {"REGISTER"}
+    bl_description = "Put the original textures back in place of the copies made by Fit Textures"
+
+    def execute(self, context):
+        restored = restore_textures()
+        self.report({'INFO'}, f"Restored {restored} textures.")
+        return {'FINISHED'}
+
 # Operator for "Auto Place" button
 class OBJECT_OT_auto_place(Operator):
     bl_idname = "object.auto_place"
@@ -761,28 +1863,308 @@ class OBJECT_OT_render_output(Operator):
             self.report({'ERROR'}, "No STL name selected.")
             return {'CANCELLED'}
 
+        objects = [bpy.data.objects.get(name) for name in STL_OBJECT_NAMES]
+        missing = [name for name, obj in zip(STL_OBJECT_NAMES, objects) if obj is None]
+        if missing:
+            self.report({'ERROR'}, f"Object '{missing[0]}' not found. Slice the model first.")
+            return {'CANCELLED'}
+
+        # The color shell is cut from the finished layer images, so the render has to block
+        shell_radius = 0
+        if props.color_shell_only:
+            shell_radius, error = color_shell_radius(context.scene)
+            if error:
+                self.report({'ERROR'}, error)
+                return {'CANCELLED'}
+
+        # After an incremental slice only the changed layers are rendered again, together with
+        # the layers whose color shell they reach into
+        scene = context.scene
+        shell_layers = color_shell_layers(scene) if shell_radius else 0
+        rendered_frames = None
         bpy.context.scene.render.filepath = output_directory+"#"
-        bpy.ops.render.render('INVOKE_DEFAULT',animation=True)
+        render_settings = layer_render_settings(scene)
+        if (
+            props.incremental_slice
+            and "polyslice_dirty_layers" in scene
+            and scene.get("polyslice_render_settings") == render_settings
+        ):
+            dirty_frames = set(scene["polyslice_dirty_layers"])
+            # A new layer count moves the frame repeating the top layer, and the top of the shell with it
+            if scene.get("polyslice_rendered_frame_end") != scene.frame_end:
+                dirty_frames.add(scene.frame_end)
+                if shell_layers:
+                    dirty_frames.add(scene.frame_end - 1)
+            frames = {
+                frame + offset
+                for frame in dirty_frames
+                for offset in range(-shell_layers, shell_layers + 1)
+                if 1 <= frame + offset <= scene.frame_end
+            }
+            rendered_frames = render_layer_frames(scene, frames)
+        elif bpy.app.background or shell_radius:
+            bpy.ops.render.render(animation=True)
+        else:
+            bpy.ops.render.render('INVOKE_DEFAULT',animation=True)
+        if shell_radius:
+            apply_color_shell(
+                bpy.path.abspath(output_directory), shell_radius, shell_layers, scene.frame_end - 1, rendered_frames
+            )
+        if "polyslice_dirty_layers" in scene:
+            scene["polyslice_dirty_layers"] = []
+        scene["polyslice_render_settings"] = render_settings
+        scene["polyslice_rendered_frame_end"] = scene.frame_end
+
+        if context.object and context.object.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
 
-        bpy.ops.object.mode_set(mode='OBJECT')
-        # Select and activate the target object
-        bpy.ops.object.select_all(action='DESELECT')
-        slice_object = bpy.data.objects["poly_stl_clone"]
-        tow = bpy.data.objects["CalibrationTower"]
-        pos = bpy.data.objects["Position"]
-        slice_object.select_set(True)
-        pos.select_set(True)
-        tow.select_set(True)
         # Define the export path
         new_name = stl_name.lower().replace(".stl", "")
         absolute_path = bpy.path.abspath(output_directory)
         export_path = absolute_path+new_name+".stl"
 
-        # Export only the selected objects
-        bpy.ops.export_mesh.stl(filepath=export_path, use_selection=True)
+        # Gather the triangles here, bpy data must only be read from the main thread
+        depsgraph = context.evaluated_depsgraph_get()
+        records = np.concatenate([stl_triangles(obj, depsgraph) for obj in objects])
+
+        if props.export_in_background and not bpy.app.background:
+            props.stl_status = f"Saving STL '{export_path}'..."
+            write_binary_stl_in_background(context.scene, export_path, records)
+        else:
+            try:
+                write_binary_stl(export_path, records)
+            except OSError as error:
+                props.stl_status = f"Failed to save STL '{export_path}': {error}"
+                self.report({'ERROR'}, props.stl_status)
+                return {'CANCELLED'}
+            props.stl_status = f"Saved STL '{export_path}'."
 
         return {'FINISHED'}        
 
+# Operator for "Estimate Ink/Time" button
+class OBJECT_OT_estimate_ink(Operator):
+    bl_idname = "object.estimate_ink"
+    bl_label = "Estimate Ink/Time"
+    bl_description = "Estimate ink use and print head time of every rendered layer and save it as CSV and JSON"
+
+    def execute(self, context):
+        props = context.scene.PolySlice_props
+        if not props.output_directory:
+            self.report({'ERROR'}, "No output path selected.")
+            return {'CANCELLED'}
+
+        output_directory = bpy.path.abspath(props.output_directory)
+        files = layer_files(output_directory)
+        if not files:
+            self.report({'ERROR'}, "No layer images found. Render the output first.")
+            return {'CANCELLED'}
+        if layer_pixel_size(context.scene) is None:
+            self.report({'ERROR'}, "Ink estimate needs an orthographic layer camera.")
+            return {'CANCELLED'}
+
+        # The pixel size comes from the images themselves, the render settings may have changed since
+        frames = list(files)
+        image_shape = None
+        areas, inks, passes = [], [], []
+        for start in range(0, len(frames), ESTIMATE_CHUNK):
+            chunk = [read_image_pixels(files[frame]) for frame in frames[start:start + ESTIMATE_CHUNK]]
+            if image_shape is None:
+                image_shape = chunk[0].shape[:2]
+                pixel_size = layer_pixel_size(context.scene, image_shape)
+            for frame, pixels in zip(frames[start:], chunk):
+                if pixels.shape[:2] != image_shape:
+                    self.report({'ERROR'}, f"Layer {frame} is {pixels.shape[1]}x{pixels.shape[0]} pixels, "
+                                f"the first layer is {image_shape[1]}x{image_shape[0]}. Render the output again.")
+                    return {'CANCELLED'}
+            stack = np.stack(chunk)
+            del chunk
+            area, ink, chunk_passes = estimate_layer_ink(stack, pixel_size, props.ink_per_mm2, props.swath_width)
+            areas.append(area)
+            inks.append(ink)
+            passes.append(chunk_passes)
+            del stack
+        areas = np.concatenate(areas)
+        inks = np.concatenate(inks)
+        passes = np.concatenate(passes)
+        seconds = passes * props.pass_time
+
+        layers = [
+            {
+                "layer": frame,
+                "covered_area_mm2": float(area),
+                "cyan_nl": float(ink[0]),
+                "magenta_nl": float(ink[1]),
+                "yellow_nl": float(ink[2]),
+                "head_passes": int(layer_passes),
+                "added_seconds": float(layer_seconds),
+            }
+            for frame, area, ink, layer_passes, layer_seconds in zip(frames, areas, inks, passes, seconds)
+        ]
+        totals = {
+            "layers": len(layers),
+            "covered_area_mm2": float(areas.sum()),
+            "cyan_ml": float(inks[:, 0].sum() / 1e6),
+            "magenta_ml": float(inks[:, 1].sum() / 1e6),
+            "yellow_ml": float(inks[:, 2].sum() / 1e6),
+            "head_passes": int(passes.sum()),
+            "added_seconds": float(seconds.sum()),
+        }
+
+        with open(os.path.join(output_directory, "ink_estimate.csv"), "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=list(layers[0]))
+            writer.writeheader()
+            writer.writerows(layers)
+        with open(os.path.join(output_directory, "ink_estimate.json"), "w") as json_file:
+            json.dump({
+                "pixel_size_mm": pixel_size,
+                "ink_per_mm2_nl": props.ink_per_mm2,
+                "swath_width_mm": props.swath_width,
+                "pass_time_seconds": props.pass_time,
+                "totals": totals,
+                "layers": layers,
+            }, json_file, indent=2)
+
+        props.estimated_layers = totals["layers"]
+        props.estimated_cyan = totals["cyan_ml"]
+        props.estimated_magenta = totals["magenta_ml"]
+        props.estimated_yellow = totals["yellow_ml"]
+        props.estimated_passes = totals["head_passes"]
+        props.estimated_seconds = totals["added_seconds"]
+
+        self.report({'INFO'}, f"Estimated {len(layers)} layers, {totals['added_seconds'] / 60:.0f} minutes of print head time.")
+        return {'FINISHED'}
+
+# Operator for "Build Preview" button
+class OBJECT_OT_build_preview(Operator):
+    bl_idname = "object.build_preview"
+    bl_label = "Build Preview"
+    bl_description = "Build a small preview of every rendered layer to scrub through in the panel"
+
+    def execute(self, context):
+        props = context.scene.PolySlice_props
+        if not props.output_directory:
+            self.report({'ERROR'}, "No output path selected.")
+            return {'CANCELLED'}
+
+        output_directory = bpy.path.abspath(props.output_directory)
+        files = layer_files(output_directory)
+        if not files:
+            self.report({'ERROR'}, "No layer images found. Render the output first.")
+            return {'CANCELLED'}
+
+        first = read_image_pixels(next(iter(files.values())))
+        width = props.preview_size
+        height = max(1, round(width * first.shape[0] / first.shape[1]))
+        shape = (len(files), height, width, 4)
+        del first
+
+        # Reuse an atlas of the same shape and only redo layers rendered since it was built
+        path = os.path.join(output_directory, PREVIEW_ATLAS_NAME)
+        atlas = None
+        if os.path.isfile(path):
+            built = os.path.getmtime(path)
+            atlas = np.load(path, mmap_mode='r+')
+            if atlas.shape != shape or atlas.dtype != np.uint8:
+                del atlas
+                atlas = None
+        if atlas is None:
+            built = None
+            preview_atlas_cache.update(path=None, mtime=None, atlas=None)
+            atlas = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=shape)
+
+        updated = 0
+        for index, layer_path in enumerate(files.values()):
+            if built is not None and os.path.getmtime(layer_path) <= built:
+                continue
+            pixels = downsample_pixels(read_image_pixels(layer_path), height, width)
+            atlas[index] = np.clip(pixels * 255 + 0.5, 0, 255).astype(np.uint8)
+            updated += 1
+        atlas.flush()
+        del atlas
+
+        props.preview_layer = min(props.preview_layer, len(files))
+        show_preview(props)
+        self.report({'INFO'}, f"Preview updated for {updated} of {len(files)} layers.")
+        return {'FINISHED'}
+
+# Render the sliced layers, compare them against the reference stack and write
+# regression_report.json. Raises RuntimeError when the check cannot be run.
+def run_regression_check(context):
+    props = context.scene.PolySlice_props
+    if not props.output_directory:
+        raise RuntimeError("No output path selected.")
+    if not props.reference_directory:
+        raise RuntimeError("No reference path selected.")
+
+    output_directory = bpy.path.abspath(props.output_directory)
+    reference_directory = bpy.path.abspath(props.reference_directory)
+    if not layer_files(reference_directory):
+        raise RuntimeError(f"No layer images found in '{reference_directory}'.")
+
+    # A report left by an earlier run must never be mistaken for this one
+    report_path = os.path.join(output_directory, "regression_report.json")
+    if os.path.isfile(report_path):
+        os.remove(report_path)
+
+    # Check the color shell settings before spending a full render on them
+    if props.color_shell_only:
+        shell_radius, error = color_shell_radius(context.scene)
+        if error:
+            raise RuntimeError(error)
+
+    # Render the layers blocking so the render can be timed and compared
+    context.scene.render.filepath = output_directory+"#"
+    start_time = time.perf_counter()
+    bpy.ops.render.render(animation=True)
+    render_time = time.perf_counter() - start_time
+
+    shell_time = 0.0
+    if props.color_shell_only:
+        start_time = time.perf_counter()
+        apply_color_shell(
+            output_directory, shell_radius, color_shell_layers(context.scene), context.scene.frame_end - 1
+        )
+        shell_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    report = compare_layer_stacks(
+        output_directory, reference_directory, props.pixel_tolerance, props.layer_tolerance, props.edge_tolerance
+    )
+    report["compare_seconds"] = time.perf_counter() - start_time
+    report["slice_seconds"] = props.last_slice_time
+    report["render_seconds"] = render_time
+    report["shell_seconds"] = shell_time
+
+    with open(report_path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+
+    summary = (
+        f"{len(report['layers'])} layers compared, {len(report['failed_layers'])} failed, "
+        f"{len(report['missing_layers'])} missing, {len(report['extra_layers'])} extra "
+        f"(slice {report['slice_seconds']:.1f}s, render {render_time:.1f}s, "
+        f"shell {shell_time:.1f}s). Report: {report_path}"
+    )
+    return report, summary
+
+# Operator for "Compare To Reference" button
+class OBJECT_OT_regression_check(Operator):
+    bl_idname = "object.regression_check"
+    bl_label = "Compare To Reference"
+    bl_description = "Render the sliced layers and compare every layer against a reference layer stack"
+
+    def execute(self, context):
+        try:
+            report, summary = run_regression_check(context)
+        except RuntimeError as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+
+        if report["passed"]:
+            self.report({'INFO'}, "Regression check passed: " + summary)
+        else:
+            self.report({'ERROR'}, "Regression check failed: " + summary)
+        return {'FINISHED'}
+
 # Panel to display the UI elements
 class VIEW3D_PT_PolySlice_panel(Panel):
     bl_label = "PolySlice"
@@ -800,14 +2182,101 @@ class VIEW3D_PT_PolySlice_panel(Panel):
         layout.operator("object.sink", text="Sink")
         layout.operator("object.trim_bottom", text="Trim Bottom")
         #layout.operator("object.auto_place", text="Auto Place")
-        #layout.prop(props, "color_thickness")
+        layout.prop(props, "color_shell_only")
+        row = layout.row()
+        row.active = props.color_shell_only
+        row.prop(props, "color_thickness")
         
         layout.prop(props, "output_directory")
         layout.prop(props, "stl_name")
         layout.prop(props, "first_layer_height")
         layout.prop(props, "layer_height")
-        layout.operator("object.slice", text="Slice!")
+        row = layout.row()
+        row.operator("object.fit_textures", text="Fit Textures")
+        row.operator("object.restore_textures", text="Restore Textures")
+        layout.prop(props, "low_memory_slice")
+        if props.low_memory_slice:
+            layout.prop(props, "incremental_slice")
+            layout.operator("object.slice_low_memory", text="Slice!")
+        else:
+            layout.operator("object.slice", text="Slice!")
+        layout.prop(props, "export_in_background")
         layout.operator("object.render_output", text="Render/Save Output")
+        if props.stl_status:
+            icon = 'ERROR' if props.stl_status.startswith("Failed") else 'INFO'
+            layout.label(text=props.stl_status, icon=icon)
+
+# Sub panel for estimating ink use and print head time of the rendered layers
+class VIEW3D_PT_PolySlice_ink_panel(Panel):
+    bl_label = "Ink Estimate"
+    bl_idname = "VIEW3D_PT_PolySlice_ink_panel"
+    bl_parent_id = "VIEW3D_PT_PolySllice_panel"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'PolySlice'
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        props = context.scene.PolySlice_props
+
+        layout.prop(props, "ink_per_mm2")
+        layout.prop(props, "swath_width")
+        layout.prop(props, "pass_time")
+        layout.operator("object.estimate_ink", text="Estimate Ink/Time")
+        if props.estimated_layers:
+            minutes, seconds = divmod(int(props.estimated_seconds), 60)
+            hours, minutes = divmod(minutes, 60)
+            box = layout.box()
+            box.label(text=f"Layers: {props.estimated_layers}")
+            box.label(text=f"Cyan: {props.estimated_cyan:.3f} mL")
+            box.label(text=f"Magenta: {props.estimated_magenta:.3f} mL")
+            box.label(text=f"Yellow: {props.estimated_yellow:.3f} mL")
+            box.label(text=f"Head Passes: {props.estimated_passes}")
+            box.label(text=f"Added Time: {hours}h {minutes:02d}m {seconds:02d}s")
+
+# Sub panel for scrubbing through the layers of the preview atlas
+class VIEW3D_PT_PolySlice_preview_panel(Panel):
+    bl_label = "Layer Preview"
+    bl_idname = "VIEW3D_PT_PolySlice_preview_panel"
+    bl_parent_id = "VIEW3D_PT_PolySllice_panel"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'PolySlice'
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        props = context.scene.PolySlice_props
+
+        layout.prop(props, "preview_size")
+        layout.operator("object.build_preview", text="Build Preview")
+        if preview_collection is None or "layer" not in preview_collection:
+            return
+        layout.prop(props, "preview_layer")
+        layout.template_icon(icon_value=preview_collection["layer"].icon_id, scale=10)
+        layout.prop(props, "preview_position")
+        layout.template_icon(icon_value=preview_collection["side"].icon_id, scale=10)
+
+# Sub panel for comparing the output against a reference layer stack
+class VIEW3D_PT_PolySlice_regression_panel(Panel):
+    bl_label = "Regression Check"
+    bl_idname = "VIEW3D_PT_PolySlice_regression_panel"
+    bl_parent_id = "VIEW3D_PT_PolySllice_panel"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'PolySlice'
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        props = context.scene.PolySlice_props
+
+        layout.prop(props, "reference_directory")
+        layout.prop(props, "pixel_tolerance")
+        layout.prop(props, "layer_tolerance")
+        layout.prop(props, "edge_tolerance")
+        layout.operator("object.regression_check", text="Compare To Reference")
 
 # Register and unregister classes
 classes = (
@@ -817,18 +2286,106 @@ classes = (
     OBJECT_OT_auto_place,
     VIEW3D_PT_PolySlice_panel,
     OBJECT_OT_slice,
+    OBJECT_OT_slice_low_memory,
+    OBJECT_OT_fit_textures,
+    OBJECT_OT_restore_textures,
     OBJECT_OT_render_output,
+    OBJECT_OT_estimate_ink,
+    OBJECT_OT_build_preview,
+    OBJECT_OT_regression_check,
+    VIEW3D_PT_PolySlice_ink_panel,
+    VIEW3D_PT_PolySlice_preview_panel,
+    VIEW3D_PT_PolySlice_regression_panel,
 )
 
 def register():
+    global preview_collection
     for cls in classes:
         bpy.utils.register_class(cls)
     bpy.types.Scene.PolySlice_props = PointerProperty(type=PolySliceProperties)
+    preview_collection = bpy.utils.previews.new()
 
 def unregister():
+    global preview_collection
+    bpy.utils.previews.remove(preview_collection)
+    preview_collection = None
+    preview_atlas_cache.update(path=None, mtime=None, atlas=None)
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
     del bpy.types.Scene.PolySlice_props
 
+# Headless regression run, e.g.
+# blender -b PolySlice.blend --python-exit-code 1 --python PolySlice.py -- --model cat.stl --reference "Presliced Samples/ColorCat" --output /tmp/cat/
+def run_headless_regression(argv):
+    parser = argparse.ArgumentParser(prog="PolySlice.py")
+    parser.add_argument("--reference", required=True, help="Directory holding the reference layer stack")
+    parser.add_argument("--output", required=True, help="Directory to render the layers to")
+    parser.add_argument("--model", help="STL/GLB file to import and slice")
+    parser.add_argument("--object", help="Name of an object in the blend file to slice")
+    parser.add_argument("--first-layer-height", type=float)
+    parser.add_argument("--layer-height", type=float)
+    parser.add_argument("--pixel-tolerance", type=float)
+    parser.add_argument("--layer-tolerance", type=float)
+    parser.add_argument("--edge-tolerance", type=float)
+    parser.add_argument("--low-memory", action="store_true", help="Use the low memory slice")
+    args = parser.parse_args(argv)
+
+    props = bpy.context.scene.PolySlice_props
+    props.output_directory = os.path.join(os.path.abspath(args.output), "")
+    props.reference_directory = os.path.abspath(args.reference)
+    if args.first_layer_height is not None:
+        props.first_layer_height = args.first_layer_height
+    if args.layer_height is not None:
+        props.layer_height = args.layer_height
+    if args.pixel_tolerance is not None:
+        props.pixel_tolerance = args.pixel_tolerance
+    if args.layer_tolerance is not None:
+        props.layer_tolerance = args.layer_tolerance
+    if args.edge_tolerance is not None:
+        props.edge_tolerance = args.edge_tolerance
+    os.makedirs(props.output_directory, exist_ok=True)
+
+    if not (args.model or args.object):
+        parser.error("either --model or --object is required")
+
+    # Any failure, including an operator reporting an error, must end with a non-zero exit code
+    try:
+        bpy.ops.object.select_all(action='DESELECT')
+        if args.model:
+            if args.model.lower().endswith((".glb", ".gltf")):
+                bpy.ops.import_scene.gltf(filepath=args.model)
+            else:
+                bpy.ops.wm.stl_import(filepath=args.model)
+            models = [obj for obj in bpy.context.selected_objects if obj.type == 'MESH']
+            if not models:
+                raise RuntimeError(f"No mesh found in '{args.model}'.")
+            bpy.ops.object.select_all(action='DESELECT')
+            for obj in models:
+                obj.select_set(True)
+            bpy.context.view_layer.objects.active = models[0]
+            if len(models) > 1:
+                bpy.ops.object.join()
+        else:
+            obj = bpy.data.objects[args.object]
+            obj.select_set(True)
+            bpy.context.view_layer.objects.active = obj
+
+        if args.low_memory:
+            result = bpy.ops.object.slice_low_memory()
+        else:
+            result = bpy.ops.object.slice()
+        if 'FINISHED' not in result:
+            raise RuntimeError("Slice did not finish.")
+
+        report, summary = run_regression_check(bpy.context)
+    except Exception as error:
+        print(f"Regression check could not run: {error}")
+        sys.exit(1)
+
+    print(("Regression check passed: " if report["passed"] else "Regression check failed: ") + summary)
+    sys.exit(0 if report["passed"] else 1)
+
 if __name__ == "__main__":
     register()
+    if "--" in sys.argv:
+        run_headless_regression(sys.argv[sys.argv.index("--") + 1:])